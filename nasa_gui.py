@@ -46,6 +46,7 @@ class TaskTab(ctk.CTkFrame):
         super().__init__(master, fg_color="transparent")
         self.tab_id = tab_id
         self.app_master = app_master
+        self.downloader = None # Live pipeline handle so the window close hook can drain its logs
 
         # Core thread queue handling locked to this specific tab instance
         self.log_queue = queue.Queue()
@@ -232,8 +233,8 @@ class TaskTab(ctk.CTkFrame):
         """Isolated background thread handling blocking network IO drops cleanly."""
         try:
             from nasa_image_downloader import ModernNASADownloader
-            downloader = ModernNASADownloader(args, logger)
-            downloader.run()
+            self.downloader = ModernNASADownloader(args, logger)
+            self.downloader.run()
         except Exception as e:
             logger.critical(f"GUI Thread runner suffered critical crash framework mapping: {e}")
         finally:
@@ -303,6 +304,7 @@ class ModernNASAGUI(ctk.CTk):
         ctk.set_default_color_theme("blue")
 
         self.tab_counter = 1
+        self.task_tabs = []
 
         # --- MANDATORY PROTOCOL DESTRUCTION INTERCEPTOR ---
         self.protocol("WM_DELETE_WINDOW", self._force_terminate_lifecycle)
@@ -336,6 +338,7 @@ class ModernNASAGUI(ctk.CTk):
         # Instantiate the design component container directly inside the newly created tab
         tab_content = TaskTab(self.tab_view.tab(tab_title), tab_title, self)
         tab_content.pack(fill="both", expand=True, padx=10, pady=10)
+        self.task_tabs.append(tab_content)
         
         # Shift active interface focus to the newly spawned tab workspace
         self.tab_view.set(tab_title)
@@ -343,6 +346,10 @@ class ModernNASAGUI(ctk.CTk):
     def _force_terminate_lifecycle(self):
         """Hard exit event handler to release ports and flush thread pools instantly from the OS layer."""
         print("\n[SHUTDOWN] Hard intercept triggered. Terminating background runtime pipelines...")
+        # SIGTERM skips every finally block, so flush buffered manifest lines before pulling the plug
+        for tab in self.task_tabs:
+            if tab.downloader is not None:
+                tab.downloader.shutdown()
         self.destroy()
         
         import os
@@ -2,9 +2,13 @@ import os
 import sys
 import subprocess
 import threading
+import queue
 import hashlib
 import random
 import time
+import io
+import re
+import tempfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 from logging.handlers import RotatingFileHandler
@@ -18,6 +22,7 @@ except ImportError:
     print("Required 'requests' module is missing. Installing it automatically...")
     subprocess.check_call([sys.executable, "-m", "pip", "install", "requests"])
     import requests
+from requests.adapters import HTTPAdapter
 
 try:
     from PIL import Image
@@ -30,7 +35,19 @@ except ImportError:
 FAILED_DOWNLOADS_FILE = "failed_downloads.txt"
 LOG_FILE = "downloaded_images.txt"
 SCRAPER_LOG_FILE = "scraper_log.txt"
+STATUS_FLUSH_LINES = 64
+STREAM_CHUNK_SIZE = 64 * 1024
+HEADER_PROBE_BYTES = 1024 * 1024 # Enough to get past bulky EXIF/XMP blocks to the dimension markers
+STATUS_FLUSH_INTERVAL = 1.0
 IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif", ".tif", ".tiff", ".bmp"]
+IMAGE_EXT_TUPLE = tuple(IMAGE_EXTENSIONS)
+IMAGE_EXT_RE = re.compile(r"\.(?:jpe?g|png|gif|tiff?|bmp)(?:$|\?)", re.IGNORECASE)
+THUMBNAIL_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# JPEG SOI, PNG, GIF, little/big-endian TIFF, BMP
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"II*\x00", b"MM\x00*", b"BM")
+
+# Shared by every downloader in the process: GUI tabs can point at the same folder
+FAILED_REGISTRY_LOCK = threading.Lock()
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
@@ -78,6 +95,27 @@ def check_directory_writable(directory, logger):
         logger.error(f"Target directory is not writable or cannot be created: {e}")
         return False
 
+class RateLimiter:
+    """Thread-safe token bucket shared by all workers; callers only sleep once the budget is spent."""
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst or rate)) # Below one token the bucket could never grant a request
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 class ModernNASADownloader:
     def __init__(self, args, logger):
         self.args = args
@@ -86,43 +124,167 @@ class ModernNASADownloader:
         self.lock = threading.Lock()
         self.failed_file_path = os.path.join(self.args.dir, FAILED_DOWNLOADS_FILE)
         self.success_file_path = os.path.join(self.args.dir, LOG_FILE)
+        self.session = self._build_session()
+        # Half a request per second per worker: a hard ceiling under the old sleep-then-request pacing,
+        # which never exceeded 1/s per worker; a burst of one token per worker lets the pool start at once
+        self.rate_limiter = RateLimiter(rate=self.args.workers * 0.5, burst=self.args.workers)
+        self.downloaded_urls = self._load_registry(self.success_file_path)
+        self.failed_urls = self._load_registry(self.failed_file_path)
+        self.restored_urls = set()
+        self.status_queue = queue.Queue()
+        self.status_writer = None
 
-    def _get_headers(self):
-        return {"User-Agent": random.choice(USER_AGENTS), "Accept": "application/json"}
+    def _build_session(self):
+        """Shared keep-alive session so repeated hits on the NASA hosts reuse warm connections."""
+        session = requests.Session()
+        session.headers.update({"User-Agent": random.choice(USER_AGENTS), "Accept": "application/json"})
+        # Default pool_maxsize is 10; size it to the worker count so threads never wait on (or discard) a connection.
+        # Retries stay at 0 here because download_image_from_cluster runs its own retry loop.
+        adapter = HTTPAdapter(pool_connections=max(10, self.args.workers), pool_maxsize=max(10, self.args.workers * 2), max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _load_registry(self, filepath):
+        """Reads a URL manifest into a set for O(1) membership checks."""
+        if not os.path.exists(filepath):
+            return set()
+        with open(filepath, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def _save_status(self, url):
+        """Thread-safe success manifest logging; queued to the writer thread while one is running."""
+        with self.lock:
+            self.downloaded_urls.add(url)
+            if self.status_writer is None:
+                with open(self.success_file_path, "a", encoding="utf-8") as f:
+                    f.write(f"{url}\n")
+                return
+            # Enqueued under the lock so nothing can slip in behind the shutdown sentinel
+            self.status_queue.put(url)
 
-    def _save_status(self, filepath, url):
-        """Thread-safe analytical logging engine."""
+    def _record_failure(self, url):
+        """Appends each new failure straight away so it survives a hard kill; failures are rare enough not to batch."""
         with self.lock:
-            with open(filepath, "a", encoding="utf-8") as f:
+            if url in self.failed_urls:
+                return
+            self.failed_urls.add(url)
+        with FAILED_REGISTRY_LOCK:
+            with open(self.failed_file_path, "a", encoding="utf-8") as f:
                 f.write(f"{url}\n")
 
+    def _compact_failed_registry(self):
+        """Drops restored and duplicate entries after a recovery pass; re-reads the file so other downloaders' appends survive."""
+        with FAILED_REGISTRY_LOCK:
+            if not os.path.exists(self.failed_file_path):
+                return
+            with open(self.failed_file_path, "r", encoding="utf-8") as f:
+                urls = dict.fromkeys(line.strip() for line in f if line.strip())
+            with self.lock:
+                remaining = [url for url in urls if url not in self.restored_urls]
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.args.dir, prefix=".failed_", suffix=".tmp", delete=False) as f:
+                f.writelines(f"{url}\n" for url in remaining)
+            os.replace(f.name, self.failed_file_path)
+
+    def _start_status_writer(self):
+        self.status_writer = threading.Thread(target=self._status_writer_loop, daemon=True)
+        self.status_writer.start()
+
+    def _stop_status_writer(self):
+        with self.lock:
+            writer, self.status_writer = self.status_writer, None
+            if writer is None:
+                return
+            self.status_queue.put(None)
+        writer.join()
+
+    def shutdown(self):
+        """Drains buffered manifest lines to disk; safe to call from another thread ahead of a hard exit."""
+        self._stop_status_writer()
+
+    def _status_writer_loop(self):
+        """Single consumer draining status_queue into one buffered handle, flushed every N lines or T seconds."""
+        pending = 0
+        last_flush = time.monotonic()
+        with open(self.success_file_path, "a", encoding="utf-8", buffering=1 << 16) as f:
+            while True:
+                timeout = max(0, last_flush + STATUS_FLUSH_INTERVAL - time.monotonic()) if pending else None
+                try:
+                    url = self.status_queue.get(timeout=timeout)
+                except queue.Empty:
+                    url = ""
+
+                if url is None:
+                    break # Shutdown sentinel; leaving the with block flushes the tail
+
+                if url:
+                    f.write(f"{url}\n")
+                    pending += 1
+
+                now = time.monotonic()
+                if pending and (pending >= STATUS_FLUSH_LINES or now - last_flush >= STATUS_FLUSH_INTERVAL):
+                    f.flush()
+                    pending = 0
+                    last_flush = now
+
     def _generate_unique_filename(self, img_url):
-        img_hash = hashlib.md5(img_url.encode()).hexdigest()[:8]
+        img_hash = hashlib.blake2b(img_url.encode(), digest_size=4).hexdigest()
         base = os.path.basename(img_url.split("?")[0])
         base_name, ext = os.path.splitext(base)
-        if not ext or ext.lower() not in IMAGE_EXTENSIONS:
+        if not base.lower().endswith(IMAGE_EXT_TUPLE):
             ext = ".jpg"
         return f"{base_name}_{img_hash}{ext}"
 
-    def _is_valid_image(self, file_path):
+    def _select_best_image_url(self, image_links):
+        """Single pass over the asset manifest: '~orig' master > any image rendition > first entry."""
+        first_image = None
+        for link in image_links:
+            if "orig" in link:
+                return link
+            if first_image is None and IMAGE_EXT_RE.search(link):
+                first_image = link
+        return first_image or image_links[0]
+
+    def _is_valid_image(self, source, label=None, full_decode=False):
+        """Magic bytes, then Pillow's lazy open for dimensions; full_decode also decodes every pixel to catch truncation."""
+        label = label or source
         try:
-            with Image.open(file_path) as img:
-                img.verify()
-            with Image.open(file_path) as img:
-                width, height = img.size
+            with (open(source, "rb") if isinstance(source, str) else source) as fp:
+                if not fp.read(16).startswith(IMAGE_SIGNATURES):
+                    raise ValueError("unrecognised image signature")
+                fp.seek(0)
+                with Image.open(fp) as img:
+                    width, height = img.size
+                    if full_decode:
+                        img.load() # verify() lets truncated JPEGs through; a real decode does not
                 if width < self.args.min_size or height < self.args.min_size:
-                    self.logger.warning(f"Skipped (Dimensions below threshold): {file_path} ({width}x{height}px)")
+                    self.logger.warning(f"Skipped (Dimensions below threshold): {label} ({width}x{height}px)")
                     return False
             return True
         except Exception as e:
-            self.logger.warning(f"Corrupted validation structure: {file_path} - {e}")
+            self.logger.warning(f"Corrupted validation structure: {label} - {e}")
             return False
 
-    def fetch_api_clusters(self):
-        """Queries the official endpoint using pagination loops to discover up to max_images targets."""
+    def _probe_image_header(self, head, label):
+        """Judges the leading bytes of a download: True/False when decided, None when the header lies past the probe."""
+        if not bytes(head[:16]).startswith(IMAGE_SIGNATURES):
+            self.logger.warning(f"Corrupted validation structure: {label} - unrecognised image signature")
+            return False
+        try:
+            with Image.open(io.BytesIO(head)) as img:
+                width, height = img.size
+        except Exception:
+            return None # e.g. libtiff writes the IFD after the pixel data; only the finished file can tell
+        if width < self.args.min_size or height < self.args.min_size:
+            self.logger.warning(f"Skipped (Dimensions below threshold): {label} ({width}x{height}px)")
+            return False
+        return True
+
+    def iter_api_clusters(self):
+        """Queries the official endpoint using pagination loops, yielding up to max_images targets as each page arrives."""
         self.logger.info(f"Querying central API registry for keyword: '{self.args.query}' (Max Limit: {getattr(self.args, 'max_images', 100)})...")
         
-        urls = []
+        urls = set() # Dedup inline; the API can repeat an asset across adjacent pages
         page = 1
         max_limit = getattr(self.args, 'max_images', 100)
         
@@ -135,7 +297,7 @@ class ModernNASADownloader:
             }
             
             try:
-                response = requests.get(self.api_url, params=params, headers=self._get_headers(), timeout=15)
+                response = self.session.get(self.api_url, params=params, timeout=15)
                 response.raise_for_status()
                 data = response.json()
                 
@@ -146,8 +308,9 @@ class ModernNASADownloader:
                     
                 for item in items:
                     href = item.get("href")
-                    if href:
-                        urls.append(href)
+                    if href and href not in urls:
+                        urls.add(href)
+                        yield href
                         if len(urls) >= max_limit:
                             break
                             
@@ -160,57 +323,91 @@ class ModernNASADownloader:
                 break
                 
         self.logger.info(f"Discovery phase completed. Identified {len(urls)} total target items.")
-        return urls
 
     def download_image_from_cluster(self, asset_json_url):
         """Processes an asset cluster and downloads the highest resolution file available."""
         retries = 0
         while retries < self.args.retries:
             try:
-                time.sleep(random.uniform(0.5, 1.5)) # Politeness delay
-                res = requests.get(asset_json_url, headers=self._get_headers(), timeout=10)
+                self.rate_limiter.acquire() # Politeness throttle
+                res = self.session.get(asset_json_url, timeout=10)
                 res.raise_for_status()
                 image_links = res.json()
                 
-                # Filter to locate the absolute best resolution available (~orig)
-                best_image_url = next((link for link in image_links if "~orig" in link or "orig" in link), image_links[0])
+                best_image_url = self._select_best_image_url(image_links)
                 
                 filename = self._generate_unique_filename(best_image_url)
                 filepath = os.path.join(self.args.dir, filename)
                 
-                # Check for existing valid files to avoid duplicate processing overhead
-                if os.path.exists(filepath) and self._is_valid_image(filepath):
+                # Manifest hit: already fetched and verified on an earlier pass, skip disk + decode entirely
+                if best_image_url in self.downloaded_urls:
+                    self.logger.info(f"Already registered in download manifest: {filename}")
+                    return True
+
+                # Check for existing valid files to avoid duplicate processing overhead. Files missing from the manifest
+                # may predate .part staging and be cut short, so this rare path pays for a full decode
+                if os.path.exists(filepath) and self._is_valid_image(filepath, full_decode=True):
                     self.logger.info(f"File already verified on local disk: {filename}")
                     return True
 
-                img_res = requests.get(best_image_url, stream=True, headers=self._get_headers(), timeout=20)
-                img_res.raise_for_status()
-                
-                content_type = img_res.headers.get('Content-Type', '')
-                if 'image' not in content_type.lower():
-                    self.logger.warning(f"Invalid payload format rejected: {content_type}")
-                    continue
-
-                with open(filepath, "wb") as f:
-                    for chunk in img_res.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                img_res = self.session.get(best_image_url, stream=True, timeout=20)
+                part_path = f"{filepath}.part"
+                try:
+                    img_res.raise_for_status()
                 
-                if self._is_valid_image(filepath):
-                    self.logger.info(f"Successfully downloaded asset: {filename}")
-                    self._save_status(self.success_file_path, best_image_url)
+                    content_type = img_res.headers.get('Content-Type', '')
+                    if 'image' not in content_type.lower():
+                        self.logger.warning(f"Invalid payload format rejected: {content_type}")
+                        retries += 1
+                        continue
+
+                    # Judge the leading bytes first, then stream the rest straight to disk;
+                    # ~orig masters can be hundreds of MB, so the full body is never held in memory
+                    chunks = img_res.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                    head = bytearray()
+                    for chunk in chunks:
+                        head += chunk
+                        if len(head) >= HEADER_PROBE_BYTES:
+                            break
+
+                    verdict = self._probe_image_header(head, filepath)
+                    if verdict is not False:
+                        # Stage under .part and rename once complete: the final path only ever holds whole files
+                        with open(part_path, "wb") as f:
+                            f.write(head)
+                            for chunk in chunks:
+                                f.write(chunk)
+
+                        # Header beyond the probe: the finished file is the first point it can be judged
+                        if verdict is None and not self._is_valid_image(part_path, filepath):
+                            retries += 1
+                            continue
+
+                        os.replace(part_path, filepath)
+                        self.logger.info(f"Successfully downloaded asset: {filename}")
+                        self._save_status(best_image_url)
                     
-                    if hasattr(self.args, 'gui_parent') and filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        try:
-                            from PIL import Image
-                            pil_img = Image.open(filepath)
+                        if hasattr(self.args, 'gui_parent') and filename.lower().endswith(THUMBNAIL_EXTENSIONS):
+                            try:
+                                from PIL import Image
+                                pil_img = Image.open(filepath)
                             
-                            pil_img = pil_img.resize((160, 120), Image.Resampling.BILINEAR)
+                                pil_img = pil_img.resize((160, 120), Image.Resampling.BILINEAR)
                             
-                            self.args.gui_parent.image_queue.put((filepath, pil_img))
-                        except Exception:
-                            pass
+                                self.args.gui_parent.image_queue.put((filepath, pil_img))
+                            except Exception:
+                                pass
 
-                    return True
+                        return True
+
+                    # Rejected payloads burn an attempt too, otherwise a permanently bad asset spins forever
+                    retries += 1
+                finally:
+                    # Hand the connection back to the pool and never leave a half-written .part behind,
+                    # whether the payload was rejected or the stream died mid-body
+                    img_res.close()
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
 
             except Exception as e:
                 retries += 1
@@ -218,20 +415,21 @@ class ModernNASADownloader:
                 time.sleep(random.uniform(2, 4))
         
         self.logger.error(f"Max retries exhausted. Abandoning target cluster: {asset_json_url}")
-        self._save_status(self.failed_file_path, asset_json_url)
+        self._record_failure(asset_json_url)
         return False
 
     def retry_failed_pipeline(self):
         """Processes failed downloads directly from error tracking registries."""
-        if not os.path.exists(self.failed_file_path) or os.path.getsize(self.failed_file_path) == 0:
+        with self.lock:
+            urls = sorted(self.failed_urls)
+            # Start from a clean registry; the file keeps the old list until the final compaction,
+            # so a kill mid-retry loses nothing (re-failures are appended and deduplicated on next load)
+            self.failed_urls.clear()
+
+        if not urls:
             self.logger.info("No failure metrics logged. Skipping error recovery mode.")
             return
-            
-        with open(self.failed_file_path, "r", encoding="utf-8") as f:
-            urls = [line.strip() for line in f if line.strip()]
-            
-        # Flush file to prevent duplicates during re-processing cycles
-        open(self.failed_file_path, "w").close()
+
         self.logger.info(f"Re-queueing {len(urls)} dropped operational targets...")
         
         success_count, fail_count = 0, 0
@@ -240,6 +438,8 @@ class ModernNASADownloader:
             for future in as_completed(futures):
                 if future.result():
                     success_count += 1
+                    with self.lock:
+                        self.restored_urls.add(futures[future])
                 else:
                     fail_count += 1
                     
@@ -247,20 +447,32 @@ class ModernNASADownloader:
 
     def run(self):
         """Core orchestrator driving the download application lifespan."""
+        self._start_status_writer()
+        try:
+            self._run_pipeline()
+        finally:
+            self._stop_status_writer()
+            if self.args.retry_failed:
+                self._compact_failed_registry()
+
+    def _run_pipeline(self):
         if self.args.retry_failed:
             self.retry_failed_pipeline()
             return
 
-        urls = self.fetch_api_clusters()
-        if not urls:
-            self.logger.warning("No executable work identified. System lifecycle ending.")
-            return
-
-        self.logger.info(f"Spawning thread pool network using {self.args.workers} background pipelines...")
         success_count, fail_count = 0, 0
+        futures = {}
         
         with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
-            futures = {executor.submit(self.download_image_from_cluster, url): url for url in urls}
+            # Workers start on page 1 while later pages are still being discovered
+            for url in self.iter_api_clusters():
+                if not futures:
+                    self.logger.info(f"Spawning thread pool network using {self.args.workers} background pipelines...")
+                futures[executor.submit(self.download_image_from_cluster, url)] = url
+            if not futures:
+                self.logger.warning("No executable work identified. System lifecycle ending.")
+                return
+
             for future in as_completed(futures):
                 try:
                     if future.result():